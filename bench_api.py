@@ -0,0 +1,725 @@
+"""
+Benchmarks do api.py. "subqueries" roda no próprio processo contra o que o
+DATABASE_URL apontar; "load" bate num servidor rodando, via HTTP.
+
+    python bench_api.py subqueries --repeat 50
+    API_CACHE_ENABLED=0 uvicorn api:app --workers 1 &
+    python bench_api.py load --label sync
+    API_CACHE_ENABLED=0 API_ASYNC_DB=1 uvicorn api:app --workers 1 &
+    python bench_api.py load --label async
+    python bench_api.py backends --urls postgresql+psycopg2://... duckdb:///data/f1.duckdb
+    python bench_api.py serialize --repeat 20
+    python bench_api.py formats
+    API_CACHE_ENABLED=0 uvicorn api:app --workers 1 &
+    python bench_api.py batch
+    python bench_api.py suite --output bench/HEAD.json --baseline bench/main.json
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import gzip
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import make_url
+
+import api
+
+# Ids populares: Monza, Hamilton, Ferrari, 2021.
+CIRCUIT_ID = 14
+DRIVER_ID = 1
+CONSTRUCTOR_ID = 6
+SEASON = 2021
+
+# Endpoints que disparam várias consultas independentes (ver api.gather).
+# __wrapped__ pula o cache de respostas, então toda chamada chega ao banco.
+MULTI_QUERY_ENDPOINTS = (
+    ("circuit_details", lambda: api.circuit_details.__wrapped__(circuit_id=CIRCUIT_ID)),
+    ("driver_profile", lambda: api.driver_profile.__wrapped__(driver_id=DRIVER_ID, streaming=False)),
+    ("season_winners", lambda: api.season_winners.__wrapped__(year=SEASON)),
+    ("constructor_stats", lambda: api.constructor_stats.__wrapped__(constructor_id=CONSTRUCTOR_ID)),
+)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_calls(call, repeat: int, warmup: int = 3) -> list[float]:
+    for _ in range(warmup):
+        call()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples: list[float]) -> str:
+    return (
+        f"mean {statistics.fmean(samples):7.2f} ms  "
+        f"p50 {percentile(samples, 0.50):7.2f} ms  "
+        f"p95 {percentile(samples, 0.95):7.2f} ms"
+    )
+
+
+def bench_subqueries(args):
+    """
+    Latência dos endpoints de várias consultas, com as consultas rodando uma
+    depois da outra (antes) e concorrentes (depois).
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        for name, endpoint in MULTI_QUERY_ENDPOINTS:
+            call = lambda: loop.run_until_complete(endpoint())
+            for parallel, label in ((False, "sequential"), (True, "concurrent")):
+                api.PARALLEL_QUERIES = parallel
+                samples = time_calls(call, args.repeat)
+                print(f"{name:<18} {label:<10}  {summarize(samples)}")
+    finally:
+        loop.close()
+
+
+# As maiores respostas, para o benchmark de serialização.
+LARGE_RESPONSES = (
+    ("driver_profile", lambda: api.driver_profile.__wrapped__(driver_id=DRIVER_ID, streaming=False)),
+    ("driver_progress", lambda: api.driver_progress.__wrapped__(season=SEASON, top_n=api.MAX_LIMIT, fmt="rows", streaming=False)),
+    ("position_heatmap", lambda: api.position_heatmap.__wrapped__(
+        season=SEASON, race_id=None, fmt="rows", season_to=None, layout="sparse"
+    )),
+    ("top_drivers_wins", lambda: api.get_top_drivers_wins.__wrapped__(limit=api.MAX_LIMIT)),
+)
+
+
+def fastapi_default_body(value) -> bytes:
+    # o que o FastAPI faz com um retorno comum: jsonable_encoder + JSONResponse
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    return JSONResponse(jsonable_encoder(value)).body
+
+
+def measure(serialize, value, repeat: int):
+    """
+    (ms de CPU por chamada, pico de KB alocados durante uma chamada).
+    """
+    serialize(value)
+    start = time.process_time()
+    for _ in range(repeat):
+        serialize(value)
+    cpu_ms = (time.process_time() - start) * 1000 / repeat
+
+    tracemalloc.start()
+    serialize(value)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_ms, peak / 1024
+
+
+def bench_serialize(args):
+    """
+    Tempo de CPU e alocações para transformar as maiores respostas em bytes.
+    Compara o padrão do FastAPI (jsonable_encoder + json) com o
+    api.raw_response (orjson).
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        values = [(name, loop.run_until_complete(call())) for name, call in LARGE_RESPONSES]
+    finally:
+        loop.close()
+
+    print(f"{'response':<18}{'bytes':>9}  {'path':<9}{'cpu ms':>9}{'peak KB':>10}")
+    for name, value in values:
+        body = api.raw_response(value).body
+        assert body == fastapi_default_body(value), f"{name}: corpos diferentes"
+        for label, serialize in (
+            ("default", fastapi_default_body),
+            ("orjson", lambda value: api.raw_response(value).body),
+        ):
+            cpu_ms, peak_kb = measure(serialize, value, args.repeat)
+            print(f"{name:<18}{len(body):>9}  {label:<9}{cpu_ms:9.3f}{peak_kb:10.1f}")
+
+
+# Endpoints de gráficos com format=rows|columnar|arrow.
+FORMAT_PATHS = (
+    f"/api/positions/heatmap?season={SEASON}",
+    f"/api/driver-progress?season={SEASON}&top_n=20",
+    "/api/lap-times/stats?race_id=1052&top_n=20",
+    f"/api/pit-stops/summary?season={SEASON}",
+)
+
+
+def as_rows(body: bytes, fmt: str) -> list[dict]:
+    # qualquer formato de volta aos objetos-linha padrão, para a checagem de equivalência
+    if fmt == "arrow":
+        import pyarrow.ipc
+
+        rows = pyarrow.ipc.open_stream(body).read_all().to_pylist()
+        return json.loads(api.dump_json(rows))
+    data = json.loads(body)
+    if fmt == "columnar":
+        return [dict(zip(data, values)) for values in zip(*data.values())]
+    return data
+
+
+def bench_formats(args):
+    """
+    Tamanho do payload (cru e gzip) de cada endpoint de gráfico por formato.
+    Confere também que todo formato traz exatamente as linhas do padrão.
+    """
+    from fastapi.testclient import TestClient
+
+    api.CACHE_ENABLED = False
+    client = TestClient(api.app)
+    print(f"{'endpoint':<48}{'format':<10}{'bytes':>9}{'gzip':>8}{'vs rows':>9}")
+    for path in FORMAT_PATHS:
+        expected, size = None, None
+        for fmt in ("rows", "columnar", "arrow"):
+            response = client.get(f"{path}&format={fmt}")
+            if response.status_code != 200:
+                print(f"{path:<48}{fmt:<10}  HTTP {response.status_code}")
+                continue
+            rows = as_rows(response.content, fmt)
+            if fmt == "rows":
+                expected, size = rows, len(response.content)
+            elif rows != expected:
+                raise SystemExit(f"{path} format={fmt}: conteúdo difere do format=rows")
+            print(
+                f"{path:<48}{fmt:<10}{len(response.content):>9}"
+                f"{len(gzip.compress(response.content)):>8}"
+                f"{len(response.content) / size if size else 0:9.2f}"
+            )
+
+
+# Mistura de endpoints de uma e de várias consultas para o teste de carga HTTP.
+# O cache responderia tudo depois da primeira rodada, então suba o servidor com
+# API_CACHE_ENABLED=0 para medir o caminho do banco.
+LOAD_PATHS = (
+    "/api/top-drivers-wins?limit=10",
+    f"/api/driver-standings?season={SEASON}",
+    f"/api/status-distribution?season={SEASON}",
+    f"/api/circuits/{CIRCUIT_ID}",
+    f"/api/drivers/{DRIVER_ID}",
+    f"/api/constructors/{CONSTRUCTOR_ID}",
+    f"/api/seasons/{SEASON}/winners",
+)
+
+
+def run_clients(url: str, clients: int, duration: float, requests=None):
+    """
+    `clients` threads, uma conexão keep-alive cada, girando por `requests`
+    (tuplas (label, method, path, body); padrão: GET de cada LOAD_PATHS) a
+    partir de offsets diferentes até passarem `duration` segundos. Retorna
+    ((label, latência em ms) das requisições bem-sucedidas, número de erros,
+    segundos decorridos).
+    """
+    requests = requests or [(path, "GET", path, None) for path in LOAD_PATHS]
+    target = urllib.parse.urlsplit(url)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+
+    def client(offset: int):
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        mine, failed, i = [], 0, offset
+        while time.perf_counter() < deadline:
+            label, method, path, body = requests[i % len(requests)]
+            i += 1
+            headers = {"Content-Type": "application/json"} if body else {}
+            start = time.perf_counter()
+            try:
+                conn.request(method, target.path.rstrip("/") + path, body, headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                continue
+            if response.status == 200:
+                mine.append((label, (time.perf_counter() - start) * 1000))
+            else:
+                failed += 1
+        conn.close()
+        latencies.extend(mine)
+        errors.append(failed)
+
+    started = time.perf_counter()
+    step = max(1, len(requests) // clients)
+    threads = [threading.Thread(target=client, args=(n * step,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors), time.perf_counter() - started
+
+
+# Todo endpoint de leitura, para a comparação entre backends.
+BACKEND_PATHS = LOAD_PATHS + (
+    f"/api/constructors-wins?season={SEASON}",
+    "/api/drivers?limit=50",
+    "/api/constructors?limit=50",
+    "/api/circuits?limit=50",
+    "/api/seasons",
+    f"/api/pit-stops/summary?season={SEASON}",
+    f"/api/positions/heatmap?season={SEASON}",
+    "/api/lap-times/stats?race_id=1052",
+    f"/api/driver-progress?season={SEASON}&top_n=5",
+)
+
+
+def bench_backends(args):
+    """
+    Latência por endpoint da mesma API em cada URL de banco passada (como
+    PostgreSQL vs o arquivo DuckDB), sem cache, pelo engine síncrono.
+    """
+    from fastapi.testclient import TestClient
+
+    api.CACHE_ENABLED = False
+    api.async_engine = None
+    client = TestClient(api.app)
+    labels, medians = [], {}
+    for url in args.urls:
+        label = make_url(url).get_backend_name()
+        labels.append(label)
+        api.engine = api.make_engine(url)
+        try:
+            for path in BACKEND_PATHS:
+                if client.get(path).status_code != 200:
+                    continue  # ex.: SQL que este backend não suporta
+                samples = time_calls(lambda: client.get(path), args.repeat)
+                medians[path, label] = f"{percentile(samples, 0.50):12.2f}"
+        finally:
+            api.engine.dispose()
+
+    print(f"{'p50 ms':<52}" + "".join(f"{label:>12}" for label in labels))
+    for path in BACKEND_PATHS:
+        print(f"{path:<52}" + "".join(medians.get((path, label), f"{'error':>12}") for label in labels))
+
+
+def bench_load(args):
+    """
+    Requisições/s e latência contra um servidor rodando, conforme crescem os
+    clientes concorrentes. Rode uma vez por modo do servidor (API_ASYNC_DB=0 / 1)
+    e compare.
+    """
+    print(f"{args.label}: {args.url}, {args.duration:.0f}s por nível")
+    for clients in args.clients:
+        samples, errors, elapsed = run_clients(args.url, clients, args.duration)
+        latencies = [ms for _, ms in samples]
+        if not latencies:
+            print(f"{clients:>4} clientes  nenhuma requisição bem-sucedida ({errors} erros)")
+            continue
+        print(
+            f"{clients:>4} clientes  {len(latencies) / elapsed:8.1f} req/s  "
+            f"{summarize(latencies)}  erros {errors}"
+        )
+
+
+# O que a página de visão geral pede, uma requisição por gráfico; o /api/batch junta tudo.
+OVERVIEW_PATHS = (
+    "/api/top-drivers-wins?limit=10",
+    f"/api/constructors-wins?season={SEASON}",
+    f"/api/driver-standings?season={SEASON}",
+    f"/api/status-distribution?season={SEASON}",
+    f"/api/driver-progress?season={SEASON}&top_n=5",
+)
+
+
+def bench_batch(args):
+    """
+    A página de visão geral como requisições separadas (em sequência numa
+    conexão e em paralelo com uma conexão cada) vs um único POST /api/batch,
+    contra um servidor rodando. Suba ele com API_CACHE_ENABLED=0 para medir o
+    banco e não o cache de respostas.
+    """
+    target = urllib.parse.urlsplit(args.url)
+    base = target.path.rstrip("/")
+    connections = [
+        http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        for _ in OVERVIEW_PATHS
+    ]
+    body = json.dumps({"requests": [
+        {"name": f"chart{n}", "path": path} for n, path in enumerate(OVERVIEW_PATHS)
+    ]})
+
+    def request(conn, method: str, path: str, payload=None) -> bytes:
+        headers = {"Content-Type": "application/json"} if payload else {}
+        conn.request(method, base + path, payload, headers)
+        response = conn.getresponse()
+        data = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path}: HTTP {response.status}")
+        return data
+
+    def sequential():
+        for path in OVERVIEW_PATHS:
+            request(connections[0], "GET", path)
+
+    def parallel():
+        list(pool.map(lambda conn, path: request(conn, "GET", path), connections, OVERVIEW_PATHS))
+
+    def batched():
+        results = json.loads(request(connections[0], "POST", "/api/batch", body))["results"]
+        failed = [name for name, item in results.items() if item["status"] != 200]
+        if failed:
+            raise RuntimeError(f"itens do batch falharam: {failed}")
+
+    print(f"{args.url}, {len(OVERVIEW_PATHS)} gráficos, temporada {SEASON}, {args.repeat} rodadas")
+    with ThreadPoolExecutor(len(OVERVIEW_PATHS)) as pool:
+        for label, call in (
+            (f"{len(OVERVIEW_PATHS)} GETs em sequência", sequential),
+            (f"{len(OVERVIEW_PATHS)} GETs em paralelo", parallel),
+            ("1 POST /api/batch", batched),
+        ):
+            print(f"{label:<22}{summarize(time_calls(call, args.repeat))}")
+    for conn in connections:
+        conn.close()
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Populado pela suíte, a não ser que --database-url diga outra coisa; URLs de
+# PostgreSQL também servem (aí o loader usa o caminho do COPY). O --data-dir
+# padrão é o data/f1 do repo, que tem todos os CSVs menos o lap_times.csv: o
+# loader deixa essa tabela vazia e o /api/lap-times/stats é medido sem linhas.
+# Aponte o --data-dir para o dump completo do Ergast para medir ele também.
+BENCH_DATABASE_URL = f"duckdb:///{os.path.join(HERE, 'data', 'bench', 'f1.duckdb')}"
+# Endpoints com menos amostras que isso no baseline não são comparados.
+MIN_COMPARED_SAMPLES = 20
+
+
+def seed_database(database_url: str, data_dir: str):
+    """
+    Monta o banco com o loader de verdade (load_f1_data.py) a partir dos CSVs
+    de `data_dir`, num subprocesso para as configurações virem do ambiente.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == "duckdb":
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+    env = dict(os.environ, DATABASE_URL=database_url, F1_DATA_DIR=data_dir)
+    env.pop("F1_BACKEND", None)
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(HERE, "load_f1_data.py"), "--no-snapshot"],
+        check=True, env=env, cwd=HERE,
+    )
+    print(f"{make_url(database_url).render_as_string()} populado em {time.perf_counter() - start:.1f}s")
+
+
+@contextlib.contextmanager
+def local_server(database_url: str, cache: bool):
+    """
+    uvicorn api:app numa porta local livre, um worker, enquanto durar o
+    bloco. O cache de respostas fica desligado a não ser com `cache`, então
+    parâmetros repetidos ainda chegam ao banco.
+    """
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, DATABASE_URL=database_url, API_CACHE_ENABLED="1" if cache else "0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=HERE,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.perf_counter() + 60
+        while True:
+            if server.poll() is not None:
+                sys.exit(f"servidor saiu com status {server.returncode}")
+            try:
+                get_json(url, "/api/ping")
+                break
+            except OSError:
+                if time.perf_counter() > deadline:
+                    sys.exit("servidor não subiu em 60s")
+                time.sleep(0.2)
+        yield url
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def get_json(url: str, path: str):
+    with urllib.request.urlopen(url.rstrip("/") + path, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def request_mix(url: str, rng: random.Random, size: int) -> list[tuple]:
+    """
+    `size` requisições (endpoint, method, path, body): endpoints sorteados
+    uniformemente e depois um dos seus conjuntos de parâmetros: toda
+    temporada, os 20 pilotos e 10 construtores com mais vitórias, os 15
+    circuitos com mais corridas, as corridas das últimas cinco temporadas. Os
+    parâmetros são lidos da própria API.
+    """
+    seasons = [row["year"] for row in get_json(url, "/api/seasons")]
+    recent = sorted(seasons)[-5:]
+    drivers = [row["driverId"] for row in get_json(url, "/api/drivers?limit=20")]
+    constructors = [row["constructorId"] for row in get_json(url, "/api/constructors?limit=10")]
+    circuits = sorted(get_json(url, "/api/circuits?limit=200"), key=lambda row: -row["total_races"])
+    circuits = [row["circuitId"] for row in circuits[:15]]
+    races = [
+        race["raceId"]
+        for year in recent
+        for race in get_json(url, f"/api/seasons/{year}/winners")["races"]
+    ]
+
+    def get(template: str, paths) -> tuple[str, list]:
+        return template, [("GET", path, None) for path in paths]
+
+    def overview(season: int):
+        body = {"requests": [
+            {"name": name, "path": path, "params": {"season": season}}
+            for name, path in OVERVIEW_BATCH
+        ]}
+        return "POST", "/api/batch", json.dumps(body)
+
+    choices = dict([
+        get("/api/top-drivers-wins", [f"/api/top-drivers-wins?limit={n}" for n in (10, 20, 50)]),
+        get("/api/constructors-wins", [f"/api/constructors-wins?season={y}" for y in seasons]),
+        get("/api/driver-standings", [f"/api/driver-standings?season={y}" for y in seasons]),
+        get("/api/status-distribution", [f"/api/status-distribution?season={y}" for y in seasons]),
+        get("/api/circuits", ["/api/circuits?limit=50", "/api/circuits?limit=50&offset=50"]),
+        get("/api/circuits/{circuit_id}", [f"/api/circuits/{c}" for c in circuits]),
+        get("/api/constructors", ["/api/constructors?limit=50", "/api/constructors?limit=50&offset=50"]),
+        get("/api/constructors/{constructor_id}", [f"/api/constructors/{c}" for c in constructors]),
+        get("/api/drivers", ["/api/drivers?limit=50", "/api/drivers?limit=50&offset=50"]),
+        get("/api/drivers/{driver_id}", [f"/api/drivers/{d}" for d in drivers]),
+        get("/api/seasons", ["/api/seasons"]),
+        get("/api/seasons/{year}/winners", [f"/api/seasons/{y}/winners" for y in seasons]),
+        get("/api/pit-stops/summary", [
+            f"/api/pit-stops/summary?season={y}&group_by={group}"
+            for y in seasons if y >= 2011 for group in ("driver", "constructor")
+        ]),
+        get("/api/positions/heatmap", [f"/api/positions/heatmap?season={y}" for y in seasons]),
+        get("/api/lap-times/stats", [f"/api/lap-times/stats?race_id={r}" for r in races]),
+        get("/api/driver-progress", [f"/api/driver-progress?season={y}&top_n=5" for y in seasons]),
+        ("/api/batch", [overview(y) for y in recent]),
+    ])
+    endpoints = sorted(name for name, requests in choices.items() if requests)
+    mix = []
+    for _ in range(size):
+        endpoint = rng.choice(endpoints)
+        mix.append((endpoint, *rng.choice(choices[endpoint])))
+    return mix
+
+
+# Os gráficos da visão geral, como itens do /api/batch (season entra por requisição).
+OVERVIEW_BATCH = (
+    ("top", "/api/top-drivers-wins"),
+    ("constructors", "/api/constructors-wins"),
+    ("standings", "/api/driver-standings"),
+    ("status", "/api/status-distribution"),
+    ("progress", "/api/driver-progress"),
+)
+
+
+def latency_stats(latencies: list[float]) -> dict:
+    return {
+        "requests": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def regressions(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    O que piorou mais que `threshold` (0.2 = 20%) em relação ao baseline,
+    nível a nível: p50/p95/p99 e vazão gerais, e o p95 de cada endpoint quando
+    o baseline tem amostras suficientes dele.
+    """
+    found = []
+    base_levels = {level["clients"]: level for level in baseline["levels"]}
+    for level in current["levels"]:
+        base = base_levels.get(level["clients"])
+        if base is None:
+            continue
+        where = f"{level['clients']} clientes"
+        if level["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            found.append(
+                f"{where}: vazão {level['throughput_rps']:.1f} req/s, era {base['throughput_rps']:.1f}"
+            )
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if level[key] > base[key] * (1 + threshold):
+                found.append(f"{where}: {key} {level[key]:.2f}, era {base[key]:.2f}")
+        for endpoint, stats in level["endpoints"].items():
+            before = base["endpoints"].get(endpoint)
+            if before is None or before["requests"] < MIN_COMPARED_SAMPLES:
+                continue
+            if stats["p95_ms"] > before["p95_ms"] * (1 + threshold):
+                found.append(
+                    f"{where}: {endpoint} p95_ms {stats['p95_ms']:.2f}, era {before['p95_ms']:.2f}"
+                )
+    return found
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=HERE
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def warm_up(url: str, requests: list[tuple]):
+    # uma passada sem medir por cada requisição distinta: pool, planos, imports preguiçosos
+    target = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+    for _, method, path, body in requests:
+        headers = {"Content-Type": "application/json"} if body else {}
+        conn.request(method, target.path.rstrip("/") + path, body, headers)
+        conn.getresponse().read()
+    conn.close()
+
+
+def run_suite(url: str, args) -> dict:
+    rng = random.Random(args.rng_seed)
+    mix = request_mix(url, rng, args.mix_size)
+    warm_up(url, list(dict.fromkeys(mix)))
+    levels = []
+    for clients in args.clients:
+        samples, errors, elapsed = run_clients(url, clients, args.duration, mix)
+        if not samples:
+            sys.exit(f"{clients} clientes: nenhuma requisição bem-sucedida ({errors} erros)")
+        by_endpoint = {}
+        for endpoint, ms in samples:
+            by_endpoint.setdefault(endpoint, []).append(ms)
+        level = {
+            "clients": clients,
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "errors": errors,
+            **latency_stats([ms for _, ms in samples]),
+            "endpoints": {name: latency_stats(by_endpoint[name]) for name in sorted(by_endpoint)},
+        }
+        levels.append(level)
+        print(
+            f"{clients:>4} clientes  {level['throughput_rps']:8.1f} req/s  p50 {level['p50_ms']:7.2f} ms  "
+            f"p95 {level['p95_ms']:7.2f} ms  p99 {level['p99_ms']:7.2f} ms  erros {errors}"
+        )
+        for name, stats in level["endpoints"].items():
+            print(
+                f"      {name:<38}{stats['requests']:>7}  p50 {stats['p50_ms']:7.2f}  "
+                f"p95 {stats['p95_ms']:7.2f}  p99 {stats['p99_ms']:7.2f}"
+            )
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": make_url(args.database_url).get_backend_name() if not args.url else None,
+            "url": args.url,
+            "cache": args.cache,
+            "duration_s": args.duration,
+            "rng_seed": args.rng_seed,
+            "mix_size": args.mix_size,
+        },
+        "levels": levels,
+    }
+
+
+def bench_suite(args):
+    """
+    Benchmark reproduzível dos endpoints: popula um banco com o
+    load_f1_data.py, serve ele com um uvicorn local e roda uma mistura de
+    semente fixa de todos os endpoints em cada nível de concorrência. Grava
+    p50/p95/p99 e vazão em JSON e sai com 1 quando uma rodada de --baseline
+    foi melhor por mais de --threshold.
+    """
+    if args.url:
+        report = run_suite(args.url, args)
+    else:
+        if not args.no_seed:
+            seed_database(args.database_url, args.data_dir)
+        with local_server(args.database_url, args.cache) as url:
+            report = run_suite(url, args)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"resultados gravados em {args.output}")
+    if args.baseline:
+        with open(args.baseline) as previous:
+            baseline = json.load(previous)
+        found = regressions(report, baseline, args.threshold)
+        commit = (baseline["meta"].get("commit") or "?")[:10]
+        if found:
+            print(f"regressões acima de {args.threshold:.0%} contra {args.baseline} ({commit}):")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"nenhuma regressão acima de {args.threshold:.0%} contra {args.baseline} ({commit})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks da API de F1.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    subqueries = commands.add_parser("subqueries", help=bench_subqueries.__doc__.split(".")[0].strip())
+    subqueries.add_argument("--repeat", type=int, default=50)
+    subqueries.set_defaults(run=bench_subqueries)
+
+    backends = commands.add_parser("backends", help=bench_backends.__doc__.split(".")[0].strip())
+    backends.add_argument("--urls", nargs="+", default=[api.DATABASE_URL, f"duckdb:///{api.DUCKDB_PATH}"])
+    backends.add_argument("--repeat", type=int, default=30)
+    backends.set_defaults(run=bench_backends)
+
+    serialize = commands.add_parser("serialize", help=bench_serialize.__doc__.split(".")[0].strip())
+    serialize.add_argument("--repeat", type=int, default=20)
+    serialize.set_defaults(run=bench_serialize)
+
+    formats = commands.add_parser("formats", help=bench_formats.__doc__.split(".")[0].strip())
+    formats.set_defaults(run=bench_formats)
+
+    load = commands.add_parser("load", help=bench_load.__doc__.split(".")[0].strip())
+    load.add_argument("--url", default="http://127.0.0.1:8000")
+    load.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    load.add_argument("--duration", type=float, default=10.0)
+    load.add_argument("--label", default="server")
+    load.set_defaults(run=bench_load)
+
+    batch = commands.add_parser("batch", help=bench_batch.__doc__.split(".")[0].strip())
+    batch.add_argument("--url", default="http://127.0.0.1:8000")
+    batch.add_argument("--repeat", type=int, default=200)
+    batch.set_defaults(run=bench_batch)
+
+    suite = commands.add_parser("suite", help=bench_suite.__doc__.split(":")[0].strip())
+    suite.add_argument("--database-url", default=BENCH_DATABASE_URL, help="banco a popular e servir")
+    suite.add_argument("--data-dir", default=os.path.join(HERE, "data", "f1"), help="CSVs para popular o banco")
+    suite.add_argument("--no-seed", action="store_true", help="reaproveita o banco como está")
+    suite.add_argument("--url", help="mede este servidor já rodando (sem popular)")
+    suite.add_argument("--cache", action="store_true", help="deixa o cache de respostas ligado")
+    suite.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    suite.add_argument("--duration", type=float, default=10.0, help="segundos por nível")
+    suite.add_argument("--mix-size", type=int, default=2000)
+    suite.add_argument("--rng-seed", type=int, default=2024)
+    suite.add_argument("--output", help="grava os resultados aqui em JSON")
+    suite.add_argument("--baseline", help="JSON de resultados de uma rodada anterior para comparar")
+    suite.add_argument("--threshold", type=float, default=0.2, help="piora permitida (0.2 = 20%%)")
+    suite.set_defaults(run=bench_suite)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
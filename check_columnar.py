@@ -0,0 +1,157 @@
+"""
+Confere se o store colunar NumPy (columnar_store.py) responde exatamente o que
+o SQL dos mesmos endpoints devolve, para toda temporada do banco, e mede o
+tempo dos dois caminhos. Sai com status 1 em qualquer divergência.
+
+    python check_columnar.py
+    python check_columnar.py --seasons 2019 2020 2021
+    python check_columnar.py --snapshot data/snapshot
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import api
+from columnar_store import TABLE_QUERIES, ColumnarStore
+
+
+def canonical(rows: list[dict]) -> list[str]:
+    return sorted(json.dumps(row, sort_keys=True, default=str) for row in rows)
+
+
+def same_ranking(sql_rows: list[dict], store_rows: list[dict], count: str) -> bool:
+    # ORDER BY <count> DESC deixa empates em qualquer ordem: mesmas linhas, mesma sequência de contagens
+    return (
+        canonical(sql_rows) == canonical(store_rows)
+        and [row[count] for row in sql_rows] == [row[count] for row in store_rows]
+    )
+
+
+def same_order(sql_rows: list[dict], store_rows: list[dict]) -> bool:
+    return canonical(sql_rows) == canonical(store_rows) and sql_rows == store_rows
+
+
+def cases(seasons: list[int]):
+    """
+    (endpoint, kwargs, chamada ao store, comparação) de cada verificação. Os
+    limites dos rankings são MAX_LIMIT para que empates no corte não mudem o
+    conjunto de linhas.
+    """
+    if seasons:
+        # faixas de temporadas saem das somas acumuladas por temporada do cubo
+        yield heatmap_matrix_case(seasons[0], seasons[-1], None)
+        yield heatmap_matrix_case(max(seasons[0], 2014), max(seasons[0], min(seasons[-1], 2021)), None)
+    yield (
+        api.get_top_drivers_wins, dict(limit=api.MAX_LIMIT),
+        lambda store: store.top_drivers_wins(api.MAX_LIMIT),
+        lambda a, b: same_ranking(a, b, "wins"),
+    )
+    for season in seasons:
+        first_race = api.query_all_dict(
+            'SELECT MIN("raceId") AS race_id FROM races WHERE year = :season', {"season": season}
+        )[0]["race_id"]
+        yield (
+            api.get_constructors_wins, dict(season=season, limit=api.MAX_LIMIT),
+            lambda store, season=season: store.constructors_wins(season, api.MAX_LIMIT),
+            lambda a, b: same_ranking(a, b, "wins"),
+        )
+        yield (
+            api.get_status_distribution, dict(season=season),
+            lambda store, season=season: store.status_distribution(season),
+            lambda a, b: same_ranking(a, b, "count"),
+        )
+        for race_id in (None, first_race):
+            yield (
+                api.position_heatmap,
+                dict(season=season, race_id=race_id, fmt="rows", season_to=None, layout="sparse"),
+                lambda store, season=season, race_id=race_id: store.position_heatmap(season, race_id),
+                same_order,
+            )
+            yield heatmap_matrix_case(season, season, race_id)
+        for top_n in (5, 20):
+            yield (
+                api.driver_progress, dict(season=season, top_n=top_n, fmt="rows", streaming=False),
+                lambda store, season=season, top_n=top_n: store.driver_progress(season, top_n),
+                same_order,
+            )
+
+
+def same_matrix(response: dict, matrix) -> bool:
+    counts, outside = matrix
+    return response["counts"] == counts.tolist() and response["outside"] == outside
+
+
+def heatmap_matrix_case(season: int, season_to: int, race_id):
+    return (
+        api.position_heatmap,
+        dict(season=season, race_id=race_id, fmt="rows", season_to=season_to, layout="matrix"),
+        lambda store: store.heatmap_matrix(season, season_to, race_id),
+        same_matrix,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seasons", type=int, nargs="*", help="padrão: toda temporada com corridas")
+    parser.add_argument("--snapshot", help="confere o snapshot mapeado desta pasta")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.snapshot:
+        store = ColumnarStore.open_snapshot(args.snapshot)
+        if store is None:
+            sys.exit(f"nenhum snapshot em {args.snapshot}")
+        print(f"snapshot v{store.version} mapeado em {(time.perf_counter() - start) * 1000:.1f} ms")
+    else:
+        tables = {name: api.query_all_dict(sql) for name, sql in TABLE_QUERIES.items()}
+        start = time.perf_counter()
+        store = ColumnarStore.from_tables(tables, version=None)
+        print(f"store montado em {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    seasons = args.seasons or [
+        row["year"] for row in api.query_all_dict("SELECT DISTINCT year FROM races ORDER BY year")
+    ]
+
+    # caminho SQL: o próprio corpo do endpoint, sem o cache nem o store
+    api.COLUMNAR_STORE = False
+    loop = asyncio.new_event_loop()
+    checked, failed = {}, {}
+    timings = {}
+    try:
+        for endpoint, kwargs, from_store, same in cases(seasons):
+            name = endpoint.__name__ + (f"[{kwargs['layout']}]" if "layout" in kwargs else "")
+
+            start = time.perf_counter()
+            sql_rows = loop.run_until_complete(endpoint.__wrapped__(**kwargs))
+            sql_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            store_rows = from_store(store)
+            store_ms = (time.perf_counter() - start) * 1000
+
+            timings.setdefault(name, ([], []))
+            timings[name][0].append(sql_ms)
+            timings[name][1].append(store_ms)
+            checked[name] = checked.get(name, 0) + 1
+            if not same(sql_rows, store_rows):
+                failed[name] = failed.get(name, 0) + 1
+                print(f"DIVERGÊNCIA {name}({kwargs})")
+    finally:
+        loop.close()
+
+    print(f"{'endpoint':<26}{'cases':>7}{'failed':>8}{'sql ms':>10}{'store ms':>10}")
+    for name, count in checked.items():
+        sql_ms, store_ms = timings[name]
+        print(
+            f"{name:<26}{count:>7}{failed.get(name, 0):>8}"
+            f"{statistics.fmean(sql_ms):10.2f}{statistics.fmean(store_ms):10.3f}"
+        )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Confere os cursores keyset de /api/circuits, /api/constructors e
+/api/drivers: percorrer todas as páginas com next_cursor devolve as mesmas
+linhas que uma página por offset, e cursores adulterados (JSON errado,
+tamanho errado, valores do tipo errado) recebem 400 em vez de chegar ao
+banco. No PostgreSQL também percorre /api/circuits uma linha por página com
+dois circuitos de nome NULL adicionados (e removidos no fim), então há
+páginas que terminam numa chave de ordenação NULL. Sai com status 1 em
+qualquer falha.
+
+    python check_cursors.py
+    python check_cursors.py --page-size 7
+"""
+import argparse
+import base64
+import contextlib
+import json
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import api
+
+LISTINGS = {
+    "/api/circuits": api.CIRCUIT_KEY,
+    "/api/constructors": api.CONSTRUCTOR_KEY,
+    "/api/drivers": api.DRIVER_KEY,
+}
+
+
+def raw_cursor(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def tampered(fields: tuple[str, ...]) -> dict[str, str]:
+    """
+    {descrição: cursor} dos cursores que têm que ser recusados para esta chave.
+    """
+    valid = ["Monza" if field == "name" else 1 for field in fields]
+    cases = {
+        "not base64": "%%%",
+        "not JSON": raw_cursor("not json"),
+        "object": api.encode_cursor({"a": 1}),
+        "too short": api.encode_cursor(valid[:-1]),
+        "too long": api.encode_cursor(valid + [1]),
+        "NaN": raw_cursor(json.dumps(valid).replace("1", "NaN", 1)),
+        "huge int": raw_cursor(json.dumps(valid).replace("1", "1" + "0" * 30, 1)),
+    }
+    for position, field in enumerate(fields):
+        for label, value in (
+            ("object", {"x": 1}), ("list", [1]), ("null", None), ("bool", True),
+            ("string", "a"), ("number", 1), ("float", 1.5),
+        ):
+            values = list(valid)
+            values[position] = value
+            if api.cursor_value_ok(field, value):
+                continue  # tipo válido para este campo
+            cases[f"{field} as {label}"] = api.encode_cursor(values)
+    return cases
+
+
+def walk(client: TestClient, path: str, page_size: int) -> list[dict]:
+    rows, cursor = [], ""
+    while cursor is not None:
+        response = client.get(path, params={"limit": page_size, "cursor": cursor})
+        response.raise_for_status()
+        page = response.json()
+        rows.extend(page["items"])
+        cursor = page["next_cursor"]
+    return rows
+
+
+@contextlib.contextmanager
+def null_name_circuits(count: int = 2):
+    with api.engine.begin() as conn:
+        first = conn.execute(text('SELECT COALESCE(MAX("circuitId"), 0) + 1 FROM circuits')).scalar()
+        ids = list(range(first, first + count))
+        for circuit_id in ids:
+            conn.execute(text('INSERT INTO circuits ("circuitId") VALUES (:id)'), {"id": circuit_id})
+    try:
+        yield ids
+    finally:
+        with api.engine.begin() as conn:
+            conn.execute(text('DELETE FROM circuits WHERE "circuitId" >= :id'), {"id": first})
+
+
+def check_listing(client: TestClient, path: str, page_size: int) -> bool:
+    everything = client.get(path, params={"limit": api.MAX_LIMIT}).json()
+    paged = walk(client, path, page_size)
+    ok = paged[:len(everything)] == everything and len(paged) >= len(everything)
+    print(f"  {path:<20} {len(paged)} linhas em páginas de {page_size}: {'ok' if ok else 'DIFERENTE'}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=25)
+    args = parser.parse_args(argv)
+    api.CACHE_ENABLED = False
+    client = TestClient(api.app)
+    failures = 0
+
+    for path, fields in LISTINGS.items():
+        failures += not check_listing(client, path, args.page_size)
+
+        for label, cursor in tampered(fields).items():
+            response = client.get(path, params={"limit": args.page_size, "cursor": cursor})
+            if response.status_code != 400:
+                failures += 1
+                print(f"  {path:<20} cursor adulterado ({label}): HTTP {response.status_code}")
+        print(f"  {path:<20} {len(tampered(fields))} cursores adulterados conferidos")
+
+    if api.BACKEND == "postgresql":
+        with null_name_circuits() as ids:
+            print(f"  circuitos {ids} adicionados com nome NULL")
+            failures += not check_listing(client, "/api/circuits", 1)
+    else:
+        print(f"  nomes de circuito NULL não conferidos: o banco {api.BACKEND} é aberto só leitura")
+
+    if failures:
+        print(f"{failures} verificações de cursor falharam")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
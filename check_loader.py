@@ -0,0 +1,123 @@
+"""
+Confere se o gerador colunar de COPY do load_f1_data.py (copy_blocks) emite
+exatamente o texto do gerador linha a linha (copy_lines), e se os chunks dele
+batem com os chunks do fingerprint_csv que a carga incremental usa. Roda nos
+CSVs de --data-dir e em CSVs pequenos gerados com linhas em branco, linhas
+curtas e longas, campos vazios e caracteres que o COPY escapa. Sai com status
+1 em qualquer divergência. Não precisa de banco.
+
+    python check_loader.py
+    python check_loader.py --data-dir data/f1 --tables results drivers
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import load_f1_data
+
+TABLES = {model.__table__.name: model.__table__ for model, _ in load_f1_data.LOADERS}
+
+# tabela -> texto CSV com o que o csv.reader e o DictReader tratam diferente
+EDGE_CASES = {
+    "status": (
+        "statusId,status\n"
+        "1,Finished\n"
+        "\n"
+        "2,Disqualified\n"
+        "3\n"
+        "4,\n"
+        "\n"
+        "\n"
+        "5,\"tab\there\"\n"
+        "6,\"back\\slash\"\n"
+        "7,\"multi\nline\"\n"
+        "8,Accident,extra\n"
+    ),
+    "drivers": (
+        "driverId,driverRef,number,code,forename,surname,dob,nationality,url\n"
+        "1,hamilton,44,HAM,Lewis,Hamilton,1985-01-07,British,http://x\n"
+        "\n"
+        "2,heidfeld,\\N,HEI,Nick,Heidfeld,1977-05-10\n"
+        "3,rosberg,6\n"
+        "4,alonso,fourteen,ALO,Fernando,Alonso,1981-7-29,Spanish,http://y\n"
+        "5,,,,,,,,\n"
+        "\n"
+    ),
+}
+
+
+def chunk_text(writer, table, chunks) -> str:
+    return "".join(writer(table, chunks))
+
+
+def check_table(table) -> list[str]:
+    problems = []
+    path = load_f1_data.csv_path(table)
+    rows, hashes = load_f1_data.fingerprint_csv(path)
+    lines = chunk_text(load_f1_data.copy_lines, table, None)
+    blocks = chunk_text(load_f1_data.copy_blocks, table, None)
+    if blocks != lines:
+        problems.append(f"texto completo do COPY difere ({first_difference(lines, blocks)})")
+    if blocks.count("\n") != rows:
+        problems.append(f"linhas do copy_blocks diferem das {rows} linhas do fingerprint_csv")
+    for chunk in range(len(hashes)):
+        if chunk_text(load_f1_data.copy_blocks, table, {chunk}) != chunk_text(
+            load_f1_data.copy_lines, table, {chunk}
+        ):
+            problems.append(f"chunk {chunk} difere")
+    return problems
+
+
+def first_difference(expected: str, actual: str) -> str:
+    for number, (a, b) in enumerate(zip(expected.splitlines(), actual.splitlines()), start=1):
+        if a != b:
+            return f"linha {number}: {a!r} != {b!r}"
+    return f"{expected.count(chr(10))} linhas != {actual.count(chr(10))} linhas"
+
+
+def run(data_dir: str, tables: list[str]) -> int:
+    failures = 0
+    load_f1_data.DATA_DIR = data_dir
+    for name in tables:
+        table = TABLES[name]
+        if not os.path.exists(load_f1_data.csv_path(table)):
+            print(f"  {name:<24} pulada (sem CSV em {data_dir})")
+            continue
+        problems = check_table(table)
+        failures += bool(problems)
+        print(f"  {name:<24} {'; '.join(problems) or 'ok'}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data-dir", default=load_f1_data.DATA_DIR)
+    parser.add_argument("--tables", nargs="+", default=sorted(TABLES), choices=sorted(TABLES))
+    args = parser.parse_args(argv)
+    if load_f1_data.np is None:
+        sys.exit("numpy não está instalado: o copy_source já usa o copy_lines")
+
+    print(f"{args.data_dir}:")
+    failures = run(args.data_dir, args.tables)
+
+    # chunks pequenos para cair linha em branco dos dois lados das bordas dos chunks
+    chunk_rows = load_f1_data.CHUNK_ROWS
+    load_f1_data.CHUNK_ROWS = 2
+    try:
+        with tempfile.TemporaryDirectory() as edge_dir:
+            for name, text in EDGE_CASES.items():
+                with open(os.path.join(edge_dir, f"{name}.csv"), "w", newline="", encoding="utf-8") as f:
+                    f.write(text)
+            print(f"casos de borda (CHUNK_ROWS={load_f1_data.CHUNK_ROWS}):")
+            failures += run(edge_dir, sorted(EDGE_CASES))
+    finally:
+        load_f1_data.CHUNK_ROWS = chunk_rows
+
+    if failures:
+        print(f"{failures} tabelas diferem")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
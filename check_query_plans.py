@@ -0,0 +1,337 @@
+"""
+Roda EXPLAIN em toda consulta SQL que os endpoints do api.py disparam e sai com
+status 1 quando alguma lê uma tabela grande (LARGE_TABLES) com seq scan, não tem
+custo no baseline guardado (query_plans.json) ou teve o custo estimado acima do
+baseline por mais que a tolerância. Consultas do baseline que não são mais
+disparadas são listadas; --update-baseline tira elas.
+
+As consultas são capturadas como vão para o driver, com os parâmetros, chamando
+cada endpoint (todo ramo de SQL: filtros, group_by, paginação, layout) por um
+TestClient com o cache de respostas, o store colunar e o engine assíncrono
+desligados. As verificações são para PostgreSQL carregado com --seed: o
+load_f1_data.py com o data/f1 mais um lap_times sintético (o data/f1 não traz
+lap_times.csv), que cria os índices da API e roda ANALYZE. São os dados em que o
+baseline commitado foi tirado, e o baseline guarda a versão do servidor e o
+comando usado. Com alguma tabela de LARGE_TABLES abaixo de MIN_LARGE_ROWS linhas
+a verificação para com erro, já que os seq scans nela não seriam pegos. No
+DuckDB as consultas só são listadas e explicadas.
+
+    python check_query_plans.py --seed
+    python check_query_plans.py --seed --update-baseline
+    python check_query_plans.py --baseline query_plans.json --tolerance 0.25
+"""
+import argparse
+import json
+import csv
+import os
+import random
+import sys
+import tempfile
+import urllib.parse
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import api
+
+# Tabelas grandes o bastante para um seq scan nelas indicar índice faltando ou
+# não usado; só conferidas com pelo menos MIN_LARGE_ROWS linhas.
+LARGE_TABLES = frozenset({"results", "driver_standings", "lap_times", "qualifying"})
+MIN_LARGE_ROWS = 1000
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "query_plans.json")
+
+# Ids populares: Monza, Hamilton, Ferrari, 2021.
+CIRCUIT_ID = 14
+DRIVER_ID = 1
+CONSTRUCTOR_ID = 6
+SEASON = 2021
+
+# Temporadas que ganham voltas no lap_times sintético do --seed.
+FIXTURE_SEASONS = range(SEASON - 2, SEASON + 1)
+LAP_TIME_FIELDS = ("raceId", "driverId", "lap", "position", "time", "milliseconds")
+
+
+def fixture_dir(data_dir: str, out_dir: str) -> str:
+    """
+    Monta em out_dir os CSVs de data_dir (por link) e, se não houver
+    lap_times.csv, um sintético: uma linha por volta completada de cada
+    resultado das FIXTURE_SEASONS, com tempos de semente fixa. Retorna
+    out_dir.
+    """
+    for name in os.listdir(data_dir):
+        if name.endswith(".csv"):
+            os.symlink(os.path.abspath(os.path.join(data_dir, name)), os.path.join(out_dir, name))
+    if os.path.exists(os.path.join(out_dir, "lap_times.csv")):
+        return out_dir
+
+    with open(os.path.join(data_dir, "races.csv"), newline="", encoding="utf-8") as f:
+        races = {row["raceId"] for row in csv.DictReader(f) if int(row["year"]) in FIXTURE_SEASONS}
+    rng = random.Random(SEASON)
+    with open(os.path.join(data_dir, "results.csv"), newline="", encoding="utf-8") as f, \
+            open(os.path.join(out_dir, "lap_times.csv"), "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow(LAP_TIME_FIELDS)
+        for row in csv.DictReader(f):
+            if row["raceId"] not in races or not row["laps"].isdigit():
+                continue
+            pace = 80000 + int(row["raceId"]) % 20 * 1000
+            for lap in range(1, int(row["laps"]) + 1):
+                ms = pace + rng.randrange(0, 4000) + (25000 if rng.random() < 0.03 else 0)
+                time_text = f"{ms // 60000}:{ms % 60000 // 1000:02d}.{ms % 1000:03d}"
+                writer.writerow((row["raceId"], row["driverId"], lap, row["positionOrder"], time_text, ms))
+    return out_dir
+
+
+def endpoint_paths(client: TestClient) -> list[str]:
+    """
+    Um GET por endpoint e por variante de SQL que ele pode montar.
+    """
+    winners = client.get(f"/api/seasons/{SEASON}/winners")
+    if winners.status_code != 200 or not winners.json()["races"]:
+        sys.exit(f"nenhuma corrida de {SEASON} no banco ({winners.status_code}); carregue ou passe --seed")
+    race_id = winners.json()["races"][0]["raceId"]
+    paths = [
+        "/api/top-drivers-wins?limit=10",
+        f"/api/constructors-wins?season={SEASON}",
+        f"/api/driver-standings?season={SEASON}",
+        f"/api/status-distribution?season={SEASON}",
+        f"/api/circuits/{CIRCUIT_ID}",
+        f"/api/constructors/{CONSTRUCTOR_ID}",
+        f"/api/drivers/{DRIVER_ID}",
+        f"/api/drivers/{DRIVER_ID}?stream=true",
+        "/api/seasons",
+        f"/api/seasons/{SEASON}/winners",
+        f"/api/pit-stops/summary?season={SEASON}",
+        f"/api/pit-stops/summary?season={SEASON}&race_id={race_id}&group_by=constructor",
+        f"/api/positions/heatmap?season={SEASON}",
+        f"/api/positions/heatmap?season={SEASON}&race_id={race_id}",
+        f"/api/positions/heatmap?season={SEASON - 5}&season_to={SEASON}&layout=matrix",
+        f"/api/lap-times/stats?race_id={race_id}",
+        f"/api/lap-times/stats?race_id={race_id}&driver_id={DRIVER_ID}",
+        f"/api/driver-progress?season={SEASON}&top_n=5",
+        f"/api/driver-progress?season={SEASON}&top_n=5&stream=true",
+    ]
+    for listing in ("/api/circuits", "/api/constructors", "/api/drivers"):
+        paths.append(f"{listing}?limit=50&offset=50")
+        paths.append(f"{listing}?limit=50&cursor=")
+        after = client.get(f"{listing}?limit=50&cursor=").json()["next_cursor"]
+        if after:
+            paths.append(f"{listing}?limit=50&cursor={urllib.parse.quote(after)}")
+    return paths
+
+
+def collect_statements(paths: list[str]) -> dict:
+    """
+    {id da consulta: (endpoint, SQL como vai para o driver, parâmetros)} de
+    tudo que os endpoints executaram; ficam os primeiros parâmetros vistos de
+    cada consulta. Os ids são o api.statement_id do SQL como está no api.py, os
+    mesmos que o /api/metrics e o log de consultas lentas usam.
+    """
+    statements = {}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        endpoint = api.current_endpoint()
+        compiled = getattr(context, "compiled", None)
+        if endpoint == "unknown" or compiled is None:
+            return  # consulta interna do dialeto, não de um endpoint
+        sid = api.statement_id(getattr(compiled.statement, "text", statement))
+        statements.setdefault(sid, (endpoint, statement, parameters))
+
+    client = TestClient(api.app)
+    event.listen(api.engine, "before_cursor_execute", capture)
+    try:
+        for path in paths:
+            response = client.get(path)
+            if response.status_code != 200:
+                sys.exit(f"GET {path}: HTTP {response.status_code} {response.text[:200]}")
+    finally:
+        event.remove(api.engine, "before_cursor_execute", capture)
+    return statements
+
+
+def explain(statement: str, parameters):
+    """
+    O plano de uma consulta capturada: o nó raiz do EXPLAIN (FORMAT JSON) no
+    PostgreSQL, o texto do plano no DuckDB.
+    """
+    with api.engine.connect() as conn:
+        if api.BACKEND == "postgresql":
+            plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return plan[0]["Plan"]
+        rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).fetchall()
+        return "\n".join(str(row[-1]) for row in rows)
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def large_tables() -> frozenset:
+    # as estimativas de linhas do planner, do VACUUM (ANALYZE) do loader
+    with api.engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relname = ANY(%(names)s)",
+            {"names": sorted(LARGE_TABLES)},
+        ).fetchall()
+    return frozenset(name for name, estimate in rows if estimate >= MIN_LARGE_ROWS)
+
+
+def seq_scans(plan: dict, tables: frozenset) -> list[str]:
+    # "Seq Scan" cobre também a variante paralela (Parallel Aware: true)
+    return sorted({
+        node["Relation Name"]
+        for node in plan_nodes(plan)
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in tables
+    })
+
+
+def server_version() -> tuple[str, int]:
+    with api.engine.connect() as conn:
+        full = conn.exec_driver_sql("SELECT version()").scalar()
+        number = int(conn.exec_driver_sql("SHOW server_version_num").scalar())
+    return full, number
+
+
+def require_empty_database():
+    # no PostgreSQL, recarregar por cima faz upsert de todas as linhas: as
+    # tuplas mortas inflam as tabelas e os custos deixam de bater com o baseline
+    with api.engine.connect() as conn:
+        loaded = conn.exec_driver_sql("SELECT to_regclass('races') IS NOT NULL").scalar()
+        loaded = loaded and conn.exec_driver_sql("SELECT EXISTS (SELECT 1 FROM races)").scalar()
+    if loaded:
+        sys.exit("--seed precisa de um banco vazio; recrie o banco do DATABASE_URL antes")
+
+
+def require_large_tables():
+    small = sorted(LARGE_TABLES - large_tables())
+    if small:
+        sys.exit(
+            f"{', '.join(small)} com menos de {MIN_LARGE_ROWS} linhas: os seq scans nelas não "
+            "seriam pegos; carregue com --seed (que gera o lap_times sintético) ou com os CSVs completos"
+        )
+
+
+def check(statements: dict, baseline: dict, tolerance: float):
+    """
+    Explica toda consulta; retorna (linhas do relatório, falhas, ids do
+    baseline que não foram mais capturados). Consulta fora do baseline falha:
+    o custo dela tem que ser revisado e guardado com --update-baseline.
+    """
+    known = baseline.get("statements", {})
+    tables = LARGE_TABLES if api.BACKEND == "postgresql" else frozenset()
+    rows, failures = [], []
+    by_endpoint = sorted(statements.items(), key=lambda item: item[1][0])
+    for sid, (endpoint, statement, parameters) in by_endpoint:
+        plan = explain(statement, parameters)
+        if not isinstance(plan, dict):
+            result = f"explicada ({len(plan.splitlines())} linhas de plano)"
+            rows.append((sid, endpoint, None, None, result))
+            continue
+        cost = plan["Total Cost"]
+        before = known.get(sid, {}).get("total_cost")
+        problems = [f"seq scan em {table}" for table in seq_scans(plan, tables)]
+        if before is None:
+            problems.append("fora do baseline")
+        elif cost > before * (1 + tolerance):
+            problems.append(f"custo {cost:.1f} > baseline {before:.1f} (+{tolerance:.0%})")
+        if problems:
+            failures.append((sid, endpoint, problems))
+        rows.append((sid, endpoint, cost, before, "; ".join(problems) or "ok"))
+    return rows, failures, sorted(set(known) - set(statements))
+
+
+def write_baseline(path: str, statements: dict, command: str):
+    entries = {}
+    for sid, (endpoint, statement, parameters) in sorted(statements.items()):
+        plan = explain(statement, parameters)
+        entries[sid] = {
+            "endpoint": endpoint,
+            "total_cost": plan["Total Cost"],
+            "sql": " ".join(statement.split()),
+        }
+    full, number = server_version()
+    baseline = {"server": full, "server_version_num": number, "command": command, "statements": entries}
+    with open(path, "w") as out:
+        json.dump(baseline, out, indent=2, sort_keys=True)
+        out.write("\n")
+    print(f"baseline de {len(entries)} consultas gravado em {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--seed", action="store_true", help="carrega o DATABASE_URL com o load_f1_data.py antes"
+    )
+    parser.add_argument("--data-dir", default=os.path.join(HERE, "data", "f1"), help="CSVs do --seed")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="guarda os custos atuais e sai"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="aumento de custo permitido (0.25 = 25%%)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.seed:
+        from bench_api import seed_database
+
+        if api.BACKEND == "postgresql":
+            require_empty_database()
+        with tempfile.TemporaryDirectory() as seed_dir:
+            seed_database(api.DATABASE_URL, fixture_dir(args.data_dir, seed_dir))
+    if api.BACKEND == "postgresql":
+        require_large_tables()
+
+    # toda consulta tem que chegar ao engine síncrono, sem cache e sem amostragem
+    api.CACHE_ENABLED = False
+    api.COLUMNAR_STORE = False
+    api.async_engine = None
+    api.SLOW_QUERY_MS = 0
+
+    statements = collect_statements(endpoint_paths(TestClient(api.app)))
+    print(f"{len(statements)} consultas capturadas em {api.BACKEND}")
+
+    if args.update_baseline:
+        if api.BACKEND != "postgresql":
+            sys.exit("o baseline de custos é estimativa do PostgreSQL; aponte o DATABASE_URL para um PostgreSQL")
+        given = sys.argv[1:] if argv is None else argv
+        command = " ".join(["python", os.path.basename(sys.argv[0]), *given])
+        write_baseline(args.baseline, statements, command)
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as stored:
+            baseline = json.load(stored)
+    elif api.BACKEND == "postgresql":
+        sys.exit(f"nenhum baseline em {args.baseline}; crie com --update-baseline")
+    if api.BACKEND == "postgresql" and "server_version_num" in baseline:
+        full, number = server_version()
+        if number // 10000 != baseline["server_version_num"] // 10000:
+            print(f"aviso: baseline tirado em {baseline['server']}; este servidor é {full}")
+    rows, failures, stale = check(statements, baseline, args.tolerance)
+
+    print(f"{'statement':<12}{'endpoint':<38}{'cost':>12}{'baseline':>12}  result")
+    for sid, endpoint, cost, before, result in rows:
+        cost_text = f"{cost:12.1f}" if cost is not None else f"{'-':>12}"
+        before_text = f"{before:12.1f}" if before is not None else f"{'-':>12}"
+        print(f"{sid:<12}{endpoint:<38}{cost_text}{before_text}  {result}")
+
+    if api.BACKEND != "postgresql":
+        print(f"planos só listados: as verificações de scan e custo precisam de PostgreSQL, não {api.BACKEND}")
+        return
+    if stale:
+        print(f"{len(stale)} consultas do baseline não são mais disparadas: {', '.join(stale)}")
+    if failures:
+        print(f"{len(failures)} consultas falharam nas verificações de plano")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Cópia colunar em memória das tabelas por trás dos endpoints de gráficos do
+api.py.
+
+Cada tabela vira arrays NumPy tipados (int NULL como -1, float NULL como NaN)
+mais lookups densos id -> linha, e results/driver_standings ficam ordenados por
+(year, raceId), então uma temporada é uma fatia achada com searchsorted. Os
+métodos de consulta reproduzem o SQL dos endpoints correspondentes (mesmos
+joins, filtros, tratamento de NULL e ordenação; empates desempatados por id)
+com bincount/unique em vez de GROUP BY. O check_columnar.py compara os dois
+caminhos.
+
+Todo o estado é array de largura fixa (texto como array "U" mais uma máscara
+de NULL), então o store inteiro pode ser gravado pelo load_f1_data.py como
+snapshot: um .bin cru por array e um manifest.json com dtypes e shapes. Os
+workers da API fazem np.memmap dele só leitura e dividem uma cópia no page
+cache.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+try:
+    import numpy as np
+except ImportError:  # o store é opcional; sem numpy o api.py segue no SQL
+    np = None
+
+NULL = -1
+
+# Heatmap denso: grid 0..HEATMAP_MAX x chegada 1..HEATMAP_MAX; resultados fora
+# dele só são contados (heatmap_outside).
+HEATMAP_MAX = 30
+HEATMAP_SHAPE = (HEATMAP_MAX + 1, HEATMAP_MAX)
+
+# Pastas temporárias de snapshot mais velhas que isso sobraram de um loader que
+# caiu e são apagadas junto com os snapshots antigos.
+STALE_BUILD_SECONDS = 3600
+
+# O que o store lê do banco, no formato que o api.query_all_dict devolve.
+TABLE_QUERIES = {
+    "races": 'SELECT "raceId", year, round, name FROM races',
+    "drivers": 'SELECT "driverId", forename, surname FROM drivers',
+    "constructors": 'SELECT "constructorId", name FROM constructors',
+    "status": 'SELECT "statusId", status FROM status',
+    "results": (
+        'SELECT "raceId", "driverId", "constructorId", "statusId", grid, position FROM results'
+    ),
+    "driver_standings": 'SELECT "raceId", "driverId", points, position FROM driver_standings',
+}
+
+
+def int_column(rows: list[dict], name: str):
+    return np.array([NULL if row[name] is None else row[name] for row in rows], dtype=np.int32)
+
+
+def float_column(rows: list[dict], name: str):
+    return np.array([np.nan if row[name] is None else row[name] for row in rows], dtype=np.float64)
+
+
+def id_lookup(ids):
+    # id -> número da linha (denso), NULL para ids que não existem (sem par no inner join)
+    lookup = np.full(max(int(ids.max()) + 1, 1) if len(ids) else 1, NULL, dtype=np.int32)
+    lookup[ids] = np.arange(len(ids))
+    return lookup
+
+
+def rows_of(lookup, ids):
+    # números de linha dos ids (NULL se desconhecido, fora da faixa ou o próprio id NULL)
+    known = (ids >= 0) & (ids < len(lookup))
+    rows = np.full(len(ids), NULL, dtype=np.int32)
+    rows[known] = lookup[ids[known]]
+    return rows
+
+
+def text_column(values: list):
+    # (texto de largura fixa, máscara de NULL); NULL é gravado como ""
+    texts = np.array(["" if value is None else value for value in values], dtype=str)
+    return texts, np.array([value is None for value in values], dtype=bool)
+
+
+def by_season(prefix: str, arrays: dict, columns: dict) -> dict:
+    """
+    Descarta linhas cuja corrida não existe (todo endpoint faz join com races),
+    adiciona as colunas year e linha da corrida e ordena tudo por
+    (year, raceId). Retorna as colunas como arrays "<prefix>.<coluna>".
+    """
+    race_row = rows_of(arrays["race_row"], columns["raceId"])
+    keep = race_row != NULL
+    columns = {name: values[keep] for name, values in columns.items()}
+    columns["race_row"] = race_row[keep]
+    columns["year"] = arrays["race_year"][columns["race_row"]]
+    order = np.lexsort((columns["raceId"], columns["year"]))
+    return {f"{prefix}.{name}": values[order] for name, values in columns.items()}
+
+
+def heatmap_cube(arrays: dict) -> dict:
+    """
+    Contagens (linha da corrida, grid, chegada - 1) de toda corrida, mais somas
+    acumuladas por temporada, então qualquer faixa de temporadas é dois
+    lookups e uma subtração.
+    """
+    race_row, grid, position = (
+        arrays["results.race_row"], arrays["results.grid"], arrays["results.position"]
+    )
+    graded = (grid != NULL) & (position != NULL)
+    inside = graded & (grid <= HEATMAP_MAX) & (position >= 1) & (position <= HEATMAP_MAX)
+    races = len(arrays["race_ids"])
+    cells = HEATMAP_SHAPE[0] * HEATMAP_SHAPE[1]
+    flat = (race_row[inside] * HEATMAP_SHAPE[0] + grid[inside]) * HEATMAP_SHAPE[1] + position[inside] - 1
+    cube = np.bincount(flat, minlength=races * cells).reshape(races, *HEATMAP_SHAPE)
+    outside = np.bincount(race_row[graded & ~inside], minlength=races)
+
+    seasons = np.unique(arrays["race_year"])
+    season_of_race = np.searchsorted(seasons, arrays["race_year"])
+    rollup = np.zeros((len(seasons), *HEATMAP_SHAPE), dtype=np.int64)
+    np.add.at(rollup, season_of_race, cube)
+    outside_rollup = np.bincount(season_of_race, weights=outside, minlength=len(seasons))
+    return {
+        "heatmap_cube": cube.astype(np.uint16),
+        "heatmap_outside": outside.astype(np.int32),
+        "heatmap_seasons": seasons.astype(np.int32),
+        "heatmap_season_cumsum": np.concatenate(
+            [np.zeros((1, *HEATMAP_SHAPE), dtype=np.int64), rollup.cumsum(axis=0)]
+        ).astype(np.int32),
+        "heatmap_outside_cumsum": np.concatenate([[0], outside_rollup.cumsum()]).astype(np.int32),
+    }
+
+
+def read_current(root: str):
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def optional_int(value):
+    return None if value == NULL else int(value)
+
+
+def optional_float(value):
+    return None if np.isnan(value) else float(value)
+
+
+def full_name(forename, surname):
+    # forename || ' ' || surname é NULL quando qualquer parte é
+    if forename is None or surname is None:
+        return None
+    return f"{forename} {surname}"
+
+
+class ColumnarStore:
+    """
+    Embrulha os arrays do from_tables() (ou de um snapshot); `version` e
+    `load_id` são a linha de data_version em que foram lidos. O número da
+    versão recomeça em 1 em todo banco novo, então só o par identifica os
+    dados.
+    """
+
+    def __init__(self, arrays: dict, version, load_id=None):
+        self.arrays = arrays
+        self.version = version
+        self.load_id = load_id
+        for name, values in arrays.items():
+            if "." not in name:
+                setattr(self, name, values)
+        self.results = self._group("results")
+        self.standings = self._group("standings")
+
+    def _group(self, prefix: str) -> dict:
+        return {
+            name.split(".", 1)[1]: values
+            for name, values in self.arrays.items()
+            if name.startswith(prefix + ".")
+        }
+
+    def _text(self, name: str, row):
+        return None if getattr(self, name + "_null")[row] else str(getattr(self, name)[row])
+
+    @classmethod
+    def from_tables(cls, tables: dict[str, list[dict]], version, load_id=None):
+        """
+        Monta o store a partir de {nome da tabela: linhas} de TABLE_QUERIES.
+        """
+        arrays = {}
+
+        races = tables["races"]
+        arrays["race_ids"] = int_column(races, "raceId")
+        arrays["race_year"] = int_column(races, "year")
+        arrays["race_round"] = int_column(races, "round")
+        arrays["race_name"], arrays["race_name_null"] = text_column([row["name"] for row in races])
+        arrays["race_row"] = id_lookup(arrays["race_ids"])
+
+        drivers = tables["drivers"]
+        arrays["driver_ids"] = int_column(drivers, "driverId")
+        arrays["driver_name"], arrays["driver_name_null"] = text_column(
+            [full_name(row["forename"], row["surname"]) for row in drivers]
+        )
+        arrays["driver_row"] = id_lookup(arrays["driver_ids"])
+
+        constructors = tables["constructors"]
+        arrays["constructor_ids"] = int_column(constructors, "constructorId")
+        arrays["constructor_name"], arrays["constructor_name_null"] = text_column(
+            [row["name"] for row in constructors]
+        )
+        arrays["constructor_row"] = id_lookup(arrays["constructor_ids"])
+
+        # GROUP BY s.status agrupa pelo texto, então statusId -> código do seu texto
+        status = tables["status"]
+        texts = sorted({row["status"] for row in status}, key=lambda s: (s is None, s or ""))
+        code_of = {text: code for code, text in enumerate(texts)}
+        arrays["status_text"], arrays["status_text_null"] = text_column(texts)
+        status_code = np.full(
+            max((row["statusId"] for row in status), default=0) + 1, NULL, dtype=np.int32
+        )
+        for row in status:
+            status_code[row["statusId"]] = code_of[row["status"]]
+        arrays["status_code"] = status_code
+
+        results = tables["results"]
+        arrays.update(by_season("results", arrays, {
+            "raceId": int_column(results, "raceId"),
+            "driverId": int_column(results, "driverId"),
+            "constructorId": int_column(results, "constructorId"),
+            "statusId": int_column(results, "statusId"),
+            "grid": int_column(results, "grid"),
+            "position": int_column(results, "position"),
+        }))
+
+        standings = tables["driver_standings"]
+        arrays.update(by_season("standings", arrays, {
+            "raceId": int_column(standings, "raceId"),
+            "driverId": int_column(standings, "driverId"),
+            "points": float_column(standings, "points"),
+            "position": int_column(standings, "position"),
+        }))
+        arrays.update(heatmap_cube(arrays))
+        return cls(arrays, version, load_id)
+
+    # ---- snapshot ----
+
+    def write_snapshot(self, root: str) -> str:
+        """
+        Grava root/v<version>-<load_id>/ (um .bin por array + manifest.json)
+        numa pasta temporária renomeada para o lugar e depois aponta
+        root/CURRENT para ela com um rename atômico. Uma pasta que os workers
+        podem mapear nunca é regravada. Mantém o snapshot anterior para os
+        workers que ainda o têm mapeado; os mais antigos são apagados.
+        """
+        name = f"v{self.version}-{self.load_id}"
+        directory = os.path.join(root, name)
+        os.makedirs(root, exist_ok=True)
+        building = tempfile.mkdtemp(prefix=f".{name}.", dir=root)
+        try:
+            os.chmod(building, 0o755)  # mkdtemp cria com 0700; os workers podem rodar com outro usuário
+            columns = {}
+            for array_name, values in self.arrays.items():
+                values = np.ascontiguousarray(values)
+                values.tofile(os.path.join(building, array_name + ".bin"))
+                columns[array_name] = {"dtype": values.dtype.str, "shape": list(values.shape)}
+            manifest = {"version": self.version, "load_id": self.load_id, "columns": columns}
+            with open(os.path.join(building, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=1)
+            os.rename(building, directory)
+        except BaseException:
+            shutil.rmtree(building, ignore_errors=True)
+            raise
+
+        current = os.path.join(root, "CURRENT")
+        previous = read_current(root)
+        pending = f"{current}.{os.getpid()}.tmp"
+        with open(pending, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(pending, current)
+        for entry in os.listdir(root):
+            path = os.path.join(root, entry)
+            if entry in (name, previous) or not os.path.isdir(path):
+                continue
+            # outro loader pode estar gravando a pasta temporária dele agora
+            if entry.startswith(".") and time.time() - os.path.getmtime(path) < STALE_BUILD_SECONDS:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+        return directory
+
+    @classmethod
+    def open_snapshot(cls, root: str):
+        """
+        Mapeia o snapshot CURRENT só leitura; None quando não há nenhum.
+        """
+        name = read_current(root)
+        if name is None:
+            return None
+        directory = os.path.join(root, name)
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        arrays = {}
+        for array_name, column in manifest["columns"].items():
+            dtype, shape = np.dtype(column["dtype"]), tuple(column["shape"])
+            if not all(shape) or dtype.itemsize == 0:
+                arrays[array_name] = np.zeros(shape, dtype=dtype)  # mmap recusa arquivo vazio
+            else:
+                path = os.path.join(directory, array_name + ".bin")
+                arrays[array_name] = np.memmap(path, dtype=dtype, mode="r", shape=shape)
+        return cls(arrays, manifest["version"], manifest.get("load_id"))
+
+    @staticmethod
+    def _season(columns: dict, season: int, season_to: int | None = None) -> dict:
+        years = columns["year"]
+        lo = np.searchsorted(years, season, "left")
+        hi = np.searchsorted(years, season if season_to is None else season_to, "right")
+        return {name: values[lo:hi] for name, values in columns.items()}
+
+    @staticmethod
+    def _ranking(ids, counts, limit: int):
+        # ORDER BY count DESC, empates por id; só os grupos que existem
+        order = np.lexsort((ids, -counts))[:limit]
+        return ids[order], counts[order]
+
+    # ---- endpoints ----
+
+    def top_drivers_wins(self, limit: int) -> list[dict]:
+        results = self.results
+        winners = results["driverId"][results["position"] == 1]
+        winners = winners[rows_of(self.driver_row, winners) != NULL]
+        counts = np.bincount(winners, minlength=len(self.driver_row))
+        ids = np.flatnonzero(counts)
+        ids, wins = self._ranking(ids, counts[ids], limit)
+        return [
+            {
+                "driverId": int(driver_id),
+                "driver_name": self._text("driver_name", self.driver_row[driver_id]),
+                "wins": int(count),
+            }
+            for driver_id, count in zip(ids, wins)
+        ]
+
+    def constructors_wins(self, season: int, limit: int) -> list[dict]:
+        results = self._season(self.results, season)
+        winners = results["constructorId"][results["position"] == 1]
+        winners = winners[rows_of(self.constructor_row, winners) != NULL]
+        counts = np.bincount(winners, minlength=len(self.constructor_row))
+        ids = np.flatnonzero(counts)
+        ids, wins = self._ranking(ids, counts[ids], limit)
+        return [
+            {
+                "constructorId": int(constructor_id),
+                "constructor_name": self._text("constructor_name", self.constructor_row[constructor_id]),
+                "wins": int(count),
+            }
+            for constructor_id, count in zip(ids, wins)
+        ]
+
+    def status_distribution(self, season: int) -> list[dict]:
+        results = self._season(self.results, season)
+        codes = rows_of(self.status_code, results["statusId"])
+        counts = np.bincount(codes[codes != NULL], minlength=len(self.status_text))
+        codes = np.flatnonzero(counts)
+        codes, totals = self._ranking(codes, counts[codes], len(codes))
+        return [
+            {"status": self._text("status_text", code), "count": int(count)}
+            for code, count in zip(codes, totals)
+        ]
+
+    def position_heatmap(self, season: int, race_id: int | None, season_to: int | None = None) -> list[dict]:
+        results = self._season(self.results, season, season_to)
+        grid, position = results["grid"], results["position"]
+        keep = (grid != NULL) & (position != NULL)
+        if race_id:
+            keep &= results["raceId"] == race_id
+        width = int(position.max()) + 1 if len(position) else 1
+        cells, counts = np.unique(grid[keep] * width + position[keep], return_counts=True)
+        return [
+            {
+                "start_position": int(cell // width),
+                "finish_position": int(cell % width),
+                "count": int(count),
+            }
+            for cell, count in zip(cells, counts)
+        ]
+
+    def heatmap_matrix(self, season: int, season_to: int, race_id: int | None):
+        """
+        (counts, outside) direto do cubo: counts[grid][chegada - 1] das corridas
+        de season..season_to (ou só de race_id, se ela estiver entre elas).
+        """
+        if race_id:
+            row = self.race_row[race_id] if 0 <= race_id < len(self.race_row) else NULL
+            if row == NULL or not season <= self.race_year[row] <= season_to:
+                return np.zeros(HEATMAP_SHAPE, dtype=np.int64), 0
+            return self.heatmap_cube[row], int(self.heatmap_outside[row])
+        seasons = self.heatmap_seasons
+        lo = np.searchsorted(seasons, season, "left")
+        hi = np.searchsorted(seasons, season_to, "right")
+        counts = self.heatmap_season_cumsum[hi] - self.heatmap_season_cumsum[lo]
+        return counts, int(self.heatmap_outside_cumsum[hi] - self.heatmap_outside_cumsum[lo])
+
+    def driver_progress(self, season: int, top_n: int) -> list[dict]:
+        season_races = self.race_ids[self.race_year == season]
+        if not len(season_races):
+            return []
+        last_race = season_races.max()
+
+        standings = self._season(self.standings, season)
+        final = standings["raceId"] == last_race
+        # ORDER BY ds.position (NULLs por último), empates por driverId
+        positions = standings["position"][final]
+        positions = np.where(positions == NULL, np.iinfo(np.int32).max, positions)
+        drivers = standings["driverId"][final]
+        top = drivers[np.lexsort((drivers, positions))[:top_n]]
+
+        keep = np.isin(standings["driverId"], top)
+        keep &= rows_of(self.driver_row, standings["driverId"]) != NULL
+        driver_ids = standings["driverId"][keep]
+        race_rows = standings["race_row"][keep]
+        rounds = self.race_round[race_rows]
+        points = standings["points"][keep]
+        position = standings["position"][keep]
+        order = np.lexsort((rounds, driver_ids))
+        return [
+            {
+                "round": optional_int(rounds[i]),
+                "grand_prix": self._text("race_name", race_rows[i]),
+                "driverId": int(driver_ids[i]),
+                "driver_name": self._text("driver_name", self.driver_row[driver_ids[i]]),
+                "points": optional_float(points[i]),
+                "position": optional_int(position[i]),
+            }
+            for i in order
+        ]
@@ -0,0 +1,169 @@
+"""
+Métricas em memória do api.py, servidas por /api/metrics no formato texto de
+exposição do Prometheus (versão 0.0.4).
+
+Os histogramas têm buckets fixos e guardam uma linha de contagens por conjunto
+de labels; uma observação é um bisect e algumas somas de inteiros sob um lock,
+barato o bastante para ficar ligado em produção. Não precisa de biblioteca
+cliente; os valores de label são strings e toda série vive até o processo
+terminar, então os labels têm que vir de conjuntos limitados (templates de
+rota, ids de statement, nomes de fase).
+"""
+import bisect
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# segundos, 0,5 ms .. 10 s
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000)
+BYTE_BUCKETS = (256, 1_024, 4_096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def label_text(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._children: dict = {}
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels: tuple[str, ...] = (), amount: float = 1):
+        with self._lock:
+            self._children[labels] = self._children.get(labels, 0) + amount
+
+    def set(self, labels: tuple[str, ...] = (), value: float = 0):
+        # para contadores mantidos em outro lugar e copiados por um collector
+        with self._lock:
+            self._children[labels] = value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            children = sorted(self._children.items())
+        lines = self.header()
+        for labels, value in children:
+            lines.append(f"{self.name}{label_text(self.labels, labels)} {number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: tuple[str, ...], value: float):
+        # bisect_left: um valor igual a um limite cai nesse bucket (le=)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(labels)
+            if child is None:
+                # [contagens por bucket, +Inf por último], soma
+                child = self._children[labels] = [[0] * (len(self.buckets) + 1), 0]
+            child[0][index] += 1
+            child[1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            children = sorted(
+                (labels, list(counts), total) for labels, (counts, total) in self._children.items()
+            )
+        lines = self.header()
+        for labels, counts, total in children:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = label_text(self.labels, labels, f'le="{number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{label_text(self.labels, labels)} {number(total)}")
+            lines.append(f"{self.name}_count{label_text(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    As métricas de um processo, na ordem de registro. Valores que já vivem em
+    outro lugar (contadores do cache e do coalescing) são copiados por um
+    callback collector logo antes de renderizar.
+    """
+
+    def __init__(self):
+        self._metrics: list[Metric] = []
+        self._collectors: list = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> bytes:
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class Phases:
+    """
+    Tempo que uma requisição passou em cada fase (checkout, execute, fetch,
+    serialize), somado sobre os seus statements; statements concorrentes da
+    mesma requisição somam de várias threads, daí o lock.
+    """
+    __slots__ = ("totals", "_lock")
+
+    def __init__(self):
+        self.totals: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self.totals[phase] = self.totals.get(phase, 0.0) + seconds
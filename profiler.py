@@ -0,0 +1,154 @@
+"""
+Profiler por amostragem de uma única requisição do api.py, com saída no
+formato de pilhas "collapsed" ("frame;frame;frame contagem" por linha) que o
+flamegraph.pl, o speedscope e o inferno leem.
+
+Uma thread de fundo lê sys._current_frames() a cada `interval` segundos e
+guarda só as pilhas que são da requisição perfilada:
+
+- na thread do event loop, quando a task que está rodando lá é uma das tasks
+  da requisição (a da própria requisição mais as criadas a partir do contexto
+  dela, registradas pelo task_factory): roteamento, validação, a corrotina do
+  endpoint, serialização;
+- nas threads de worker enquanto rodam trabalho da requisição (attached()):
+  query_all_dict, SQLAlchemy e o driver do banco. Essas amostras são de tempo
+  de parede, então o tempo esperando o banco aparece como leitura de socket do
+  driver.
+
+O amostrador precisa do GIL para ler os frames; enquanto a thread do loop roda
+código Python sem esperar I/O, ela só é amostrada a cada troca de GIL
+(sys.getswitchinterval(), 5 ms por padrão), por menor que seja `interval`. O
+switch interval vale para o processo inteiro e fica como está: baixá-lo
+deixaria mais lenta toda requisição que o worker estiver atendendo.
+
+O task factory só fica no loop enquanto houver ao menos um profile rodando.
+"""
+import asyncio
+import contextlib
+import contextvars
+import os
+import sys
+import threading
+import time
+
+# Profile da requisição sendo atendida, se ela pediu um.
+active_profile = contextvars.ContextVar("active_profile", default=None)
+
+_lock = threading.Lock()
+_running = 0
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapsed_stack(frame, root: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    return ";".join(reversed(labels))
+
+
+def task_factory(previous=None):
+    """
+    Task factory do loop que adiciona ao profile toda task criada enquanto ele
+    está ativo no contexto que a cria (asyncio.gather, tasks do single-flight,
+    ...). Fora de um profile custa uma leitura de ContextVar por task.
+    """
+    def factory(loop, coro, **kwargs):
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        profile = active_profile.get()
+        if profile is not None:
+            profile.tasks.add(task)
+        return task
+
+    factory.profiling = True
+    factory.previous = previous
+    return factory
+
+
+def install_task_factory(loop):
+    current = loop.get_task_factory()
+    if not getattr(current, "profiling", False):
+        loop.set_task_factory(task_factory(current))
+
+
+def remove_task_factory(loop):
+    current = loop.get_task_factory()
+    if getattr(current, "profiling", False):
+        loop.set_task_factory(current.previous)
+
+
+class Sampler:
+    def __init__(self, loop, interval: float):
+        self.loop = loop
+        self.interval = interval
+        self.loop_thread = threading.get_ident()
+        self.tasks: set = set()
+        self.samples: dict[str, int] = {}
+        self.sample_count = 0
+        self._threads: dict[int, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="f1-profiler", daemon=True)
+        self.started = self.stopped = None
+
+    @contextlib.contextmanager
+    def attached(self):
+        # a thread (worker) que chamou é amostrada até o bloco terminar
+        ident = threading.get_ident()
+        self._threads[ident] = self._threads.get(ident, 0) + 1
+        try:
+            yield
+        finally:
+            self._threads[ident] -= 1
+            if not self._threads[ident]:
+                del self._threads[ident]
+
+    def start(self):
+        global _running
+        with _lock:
+            _running += 1
+            install_task_factory(self.loop)
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        global _running
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+        with _lock:
+            _running -= 1
+            if not _running:
+                remove_task_factory(self.loop)
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = []
+            if asyncio.current_task(self.loop) in self.tasks:
+                frame = frames.get(self.loop_thread)
+                if frame is not None:
+                    stacks.append(collapsed_stack(frame, "event-loop"))
+            for ident in list(self._threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    if ident not in names:
+                        names[ident] = next(
+                            (t.name for t in threading.enumerate() if t.ident == ident), str(ident)
+                        )
+                    stacks.append(collapsed_stack(frame, names[ident]))
+            for stack in stacks:
+                self.samples[stack] = self.samples.get(stack, 0) + 1
+            self.sample_count += 1
+            del frames
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))